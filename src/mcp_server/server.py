@@ -4,15 +4,21 @@ RotoTV Debug MCP Server
 Provides debugging and administrative tools for RotoTV backend.
 All secrets (auth tokens, AWS credentials) are read from environment variables.
 """
+import atexit
 import json
 import logging
+import sys
+import threading
 import time
 import uuid
 import csv
+import functools
 import os
+from http.cookiejar import CookieJar, DefaultCookiePolicy
 from datetime import datetime, timedelta, timezone
 from io import StringIO
-from typing import Optional
+from types import MappingProxyType
+from typing import Mapping, Optional
 
 import httpx
 
@@ -32,28 +38,64 @@ mcp = FastMCP(
     # `host` and `port` will not work for stdio transport
 )
 
-import os
-from typing import Dict
+# Shared HTTP client so backend calls reuse keep-alive connections and TLS sessions.
+# Its cookie jar rejects every cookie, so no state carries over between calls that
+# use different tokens.
+_HTTP = httpx.Client(
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=10),
+    cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+)
+atexit.register(_HTTP.close)
 
 # Backend URLs for different environments
-BACKENDS: Dict[str, str] = {
+BACKENDS: Mapping[str, str] = MappingProxyType({
     "prod": "https://api.rotopus.ai",
     "stage": "https://api-stage.rotopus.ai",
     "dev": "http://localhost:8000",
-}
+})
 
 # CloudWatch log groups for different environments
-LOG_GROUPS: Dict[str, str] = {
+LOG_GROUPS: Mapping[str, str] = MappingProxyType({
     "stage": "/ecs/rototv-stage-backend",
     "prod": "/ecs/rototv-prod-backend",
-}
+})
+
+# Valid environment names, and error messages for unknown ones, built once at import
+_BACKEND_KEYS = tuple(BACKENDS)
+_LOG_GROUP_KEYS = tuple(LOG_GROUPS)
+_BACKENDS_ERR = "Invalid environment: {}. Must be one of: " + ", ".join(_BACKEND_KEYS)
+_LOG_GROUPS_ERR = "Invalid environment: {}. Must be one of: " + ", ".join(_LOG_GROUP_KEYS)
+
+# Pretty-printed JSON is opt-in; compact output stays on json's C encoder
+PRETTY_JSON = os.getenv("ROTO_PRETTY_JSON") == "1"
+_JSON_FORMAT = {"indent": 2} if PRETTY_JSON else {"separators": (",", ":")}
+
+# Auth token resolved from the environment on first use (env is fixed per process)
+_AUTH_TOKEN_CACHE: Optional[str] = None
+
+# Set once the AWS credentials have been copied into os.environ for boto3
+_AWS_HYDRATED = False
+
+# Synthetic CloudWatch result fields left out of CSV output
+_SKIP_FIELDS = frozenset({"@ptr"})
+
+# boto3 module, imported on first CloudWatch query since most sessions never need it
+# (None until tried, False if it is not installed, so the failed import is not retried)
+_BOTO3 = None
+_BOTO3_ERR = "Error: boto3 not installed. Install with: uv add boto3"
+
+# CloudWatch Logs client, created on first use and shared across calls
+_LOGS_CLIENT = None
+_LOGS_CLIENT_LOCK = threading.Lock()
 
 
 def get_auth_token(env: str) -> str:
     """
     Get authentication token from environment variable.
 
-    Reads from ROTO_AUTH_TOKEN environment variable.
+    Reads from ROTO_AUTH_TOKEN environment variable. The token is cached for the
+    lifetime of the process once found; a missing token is not cached.
 
     Args:
         env: Environment name (prod, stage, dev) - not used, kept for API compatibility
@@ -64,6 +106,10 @@ def get_auth_token(env: str) -> str:
     Raises:
         ValueError: If token is not set in environment
     """
+    global _AUTH_TOKEN_CACHE
+    if _AUTH_TOKEN_CACHE is not None:
+        return _AUTH_TOKEN_CACHE
+
     token = os.getenv("ROTO_AUTH_TOKEN")
 
     if not token:
@@ -72,15 +118,19 @@ def get_auth_token(env: str) -> str:
             "Please set environment variable ROTO_AUTH_TOKEN"
         )
 
+    _AUTH_TOKEN_CACHE = token
     return token
 
 
-def get_aws_credentials() -> Dict[str, str]:
+@functools.lru_cache(maxsize=1)
+def get_aws_credentials() -> Mapping[str, str]:
     """
     Get AWS credentials from environment variables.
 
+    The result is cached for the lifetime of the process.
+
     Returns:
-        Dictionary with AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_DEFAULT_REGION
+        Read-only mapping with AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_DEFAULT_REGION
 
     Raises:
         ValueError: If required credentials are missing
@@ -97,7 +147,7 @@ def get_aws_credentials() -> Dict[str, str]:
             )
         credentials[key] = value
 
-    return credentials
+    return MappingProxyType(credentials)
 
 
 def get_backend_url(env: str) -> str:
@@ -113,9 +163,10 @@ def get_backend_url(env: str) -> str:
     Raises:
         ValueError: If environment is invalid
     """
-    if env not in BACKENDS:
-        raise ValueError(f"Invalid environment: {env}. Must be one of: {', '.join(BACKENDS.keys())}")
-    return BACKENDS[env]
+    url = BACKENDS.get(env)
+    if url is None:
+        raise ValueError(_BACKENDS_ERR.format(env))
+    return url
 
 
 def get_log_group(env: str) -> str:
@@ -131,9 +182,92 @@ def get_log_group(env: str) -> str:
     Raises:
         ValueError: If environment is invalid
     """
-    if env not in LOG_GROUPS:
-        raise ValueError(f"Invalid environment: {env}. Must be one of: {', '.join(LOG_GROUPS.keys())}")
-    return LOG_GROUPS[env]
+    log_group = LOG_GROUPS.get(env)
+    if log_group is None:
+        raise ValueError(_LOG_GROUPS_ERR.format(env))
+    return log_group
+
+
+def _to_json(obj) -> str:
+    """Serialize a tool response, compact unless ROTO_PRETTY_JSON=1."""
+    return json.dumps(obj, ensure_ascii=False, **_JSON_FORMAT)
+
+
+def _json_body(response: httpx.Response) -> str:
+    """Return a backend JSON body, passing it through as-is when output is compact.
+
+    Non-JSON bodies (e.g. an HTML proxy page) are still parsed so they raise
+    and surface as a tool error in both modes.
+    """
+    if not PRETTY_JSON and response.headers.get("content-type", "").startswith("application/json"):
+        return response.text
+    return _to_json(response.json())
+
+
+@functools.lru_cache(maxsize=8)
+def _auth_headers(token: str) -> Mapping[str, str]:
+    """Return a shared, read-only Authorization header mapping for a token."""
+    return MappingProxyType({"Authorization": f"Bearer {token}"})
+
+
+def _tool_json_errors(fn):
+    """Turn exceptions raised by a JSON tool into a JSON error response."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except httpx.HTTPStatusError as exc:
+            return _to_json({
+                "success": False,
+                "error": f"Request failed ({exc.response.status_code})",
+                "details": exc.response.text
+            })
+        except Exception as exc:
+            return _to_json({
+                "success": False,
+                "error": str(exc)
+            })
+    return wrapper
+
+
+@functools.lru_cache(maxsize=128)
+def _session_query(session_id: str, limit: int) -> str:
+    """Build the Logs Insights query that finds all log lines for a session."""
+    return (
+        f"fields @timestamp, record.message | "
+        f"filter @message like /{session_id}/ | "
+        f"sort @timestamp desc | "
+        f"limit {limit}"
+    )
+
+
+@functools.lru_cache(maxsize=64)
+def _fmt_range(n: int, unit: str) -> str:
+    """Describe a time range, e.g. "1 day" or "6 hours"."""
+    return f"{n} {unit}{'s' if n != 1 else ''}"
+
+
+def _load_boto3():
+    """Import boto3 on first use and cache it; caches False if it is not installed."""
+    global _BOTO3
+    if _BOTO3 is None:
+        try:
+            import boto3
+        except ImportError:
+            _BOTO3 = False
+        else:
+            _BOTO3 = boto3
+    return _BOTO3
+
+
+def _get_logs_client():
+    """Return the shared boto3 CloudWatch Logs client, creating it on first use."""
+    global _LOGS_CLIENT
+    if _LOGS_CLIENT is None:
+        with _LOGS_CLIENT_LOCK:
+            if _LOGS_CLIENT is None:
+                _LOGS_CLIENT = _load_boto3().client('logs')
+    return _LOGS_CLIENT
 
 
 @mcp.tool()
@@ -146,11 +280,12 @@ def generate_uuid(count: int = 1) -> str:
     Returns:
         UUIDs as newline-separated string
     """
-    uuids = [str(uuid.uuid4()) for _ in range(max(count, 0))]
-    return "\n".join(uuids)
+    uuid4 = uuid.uuid4
+    return "\n".join([str(uuid4()) for _ in range(max(count, 0))])
 
 
 @mcp.tool()
+@_tool_json_errors
 def create_session(env: str, project_id: str, token: Optional[str] = None) -> str:
     """Create a new play session from a project.
 
@@ -162,45 +297,28 @@ def create_session(env: str, project_id: str, token: Optional[str] = None) -> st
     Returns:
         JSON response with session details
     """
-    try:
-        base_url = get_backend_url(env)
-        url = f"{base_url}/api/play/"
-
-        auth_token = token if token else get_auth_token(env)
-        headers = {"Authorization": f"Bearer {auth_token}"}
-        response = httpx.post(url, json={"project_id": project_id}, headers=headers, timeout=30)
-        response.raise_for_status()
-        session = response.json()
-
-        result = {
-            "success": True,
-            "session": session,
-            "next_steps": {
-                "get_m3u8": f"Use get_m3u8 tool with session_id={session['id']}",
-                "get_session_state": f"Use get_session_state tool with session_id={session['id']}"
-            }
+    base_url = get_backend_url(env)
+    url = f"{base_url}/api/play/"
+
+    auth_token = token if token else get_auth_token(env)
+    headers = _auth_headers(auth_token)
+    response = _HTTP.post(url, json={"project_id": project_id}, headers=headers, timeout=30)
+    response.raise_for_status()
+    session = response.json()
+
+    result = {
+        "success": True,
+        "session": session,
+        "next_steps": {
+            "get_m3u8": f"Use get_m3u8 tool with session_id={session['id']}",
+            "get_session_state": f"Use get_session_state tool with session_id={session['id']}"
         }
-        return json.dumps(result, indent=2, ensure_ascii=False)
-
-    except ValueError as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
-    except httpx.HTTPStatusError as exc:
-        return json.dumps({
-            "success": False,
-            "error": f"Request failed ({exc.response.status_code})",
-            "details": exc.response.text
-        }, indent=2)
-    except Exception as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
+    }
+    return _to_json(result)
 
 
 @mcp.tool()
+@_tool_json_errors
 def create_interaction(
     env: str,
     session_id: str,
@@ -220,40 +338,22 @@ def create_interaction(
     Returns:
         JSON response with interaction result
     """
-    try:
-        base_url = get_backend_url(env)
-        url = f"{base_url}/api/play/{session_id}/{node_id}/interactions"
-
-        auth_token = token if token else get_auth_token(env)
-        headers = {"Authorization": f"Bearer {auth_token}"}
-        response = httpx.post(url, json={"message": message}, headers=headers, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-
-        return json.dumps({
-            "success": True,
-            "result": result,
-            "next_steps": {
-                "get_session_state": f"Use get_session_state tool with session_id={session_id}"
-            }
-        }, indent=2, ensure_ascii=False)
-
-    except ValueError as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
-    except httpx.HTTPStatusError as exc:
-        return json.dumps({
-            "success": False,
-            "error": f"Request failed ({exc.response.status_code})",
-            "details": exc.response.text
-        }, indent=2)
-    except Exception as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
+    base_url = get_backend_url(env)
+    url = f"{base_url}/api/play/{session_id}/{node_id}/interactions"
+
+    auth_token = token if token else get_auth_token(env)
+    headers = _auth_headers(auth_token)
+    response = _HTTP.post(url, json={"message": message}, headers=headers, timeout=30)
+    response.raise_for_status()
+    result = response.json()
+
+    return _to_json({
+        "success": True,
+        "result": result,
+        "next_steps": {
+            "get_session_state": f"Use get_session_state tool with session_id={session_id}"
+        }
+    })
 
 
 @mcp.tool()
@@ -279,11 +379,11 @@ def get_m3u8(
         url = f"{base_url}/api/play/{session_id}/m3u8"
 
         auth_token = token if token else get_auth_token(env)
-        headers = {"Authorization": f"Bearer {auth_token}"}
+        headers = _auth_headers(auth_token)
 
         if play_index is not None:
-            headers["x-play-index"] = str(play_index)
-        response = httpx.get(url, headers=headers, timeout=20)
+            headers = {**headers, "x-play-index": str(play_index)}
+        response = _HTTP.get(url, headers=headers, timeout=20)
         response.raise_for_status()
         return response.text
 
@@ -296,6 +396,7 @@ def get_m3u8(
 
 
 @mcp.tool()
+@_tool_json_errors
 def get_session_state(env: str, session_id: str, token: Optional[str] = None) -> str:
     """Fetch SessionState from the session API.
 
@@ -305,37 +406,20 @@ def get_session_state(env: str, session_id: str, token: Optional[str] = None) ->
         token: Optional auth token (reads from ROTO_AUTH_TOKEN_<ENV> env var if not provided)
 
     Returns:
-        JSON session state
+        JSON session state (the backend's raw response body unless ROTO_PRETTY_JSON=1)
     """
-    try:
-        base_url = get_backend_url(env)
-        url = f"{base_url}/api/play/{session_id}/state"
-
-        auth_token = token if token else get_auth_token(env)
-        headers = {"Authorization": f"Bearer {auth_token}"}
-        response = httpx.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        return json.dumps(response.json(), indent=2, ensure_ascii=False)
+    base_url = get_backend_url(env)
+    url = f"{base_url}/api/play/{session_id}/state"
 
-    except ValueError as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
-    except httpx.HTTPStatusError as exc:
-        return json.dumps({
-            "success": False,
-            "error": f"Request failed ({exc.response.status_code})",
-            "details": exc.response.text
-        }, indent=2)
-    except Exception as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
+    auth_token = token if token else get_auth_token(env)
+    headers = _auth_headers(auth_token)
+    response = _HTTP.get(url, headers=headers, timeout=20)
+    response.raise_for_status()
+    return _json_body(response)
 
 
 @mcp.tool()
+@_tool_json_errors
 def get_project_state(env: str, project_id: str, token: Optional[str] = None) -> str:
     """Fetch ProjectState from the API.
 
@@ -348,34 +432,16 @@ def get_project_state(env: str, project_id: str, token: Optional[str] = None) ->
         token: Optional auth token (reads from ROTO_AUTH_TOKEN_<ENV> env var if not provided)
 
     Returns:
-        JSON project state
+        JSON project state (the backend's raw response body unless ROTO_PRETTY_JSON=1)
     """
-    try:
-        base_url = get_backend_url(env)
-        url = f"{base_url}/api/projects/{project_id}"
+    base_url = get_backend_url(env)
+    url = f"{base_url}/api/projects/{project_id}"
 
-        auth_token = token if token else get_auth_token(env)
-        headers = {"Authorization": f"Bearer {auth_token}"}
-        response = httpx.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-        return json.dumps(response.json(), indent=2, ensure_ascii=False)
-
-    except ValueError as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
-    except httpx.HTTPStatusError as exc:
-        return json.dumps({
-            "success": False,
-            "error": f"Request failed ({exc.response.status_code})",
-            "details": exc.response.text
-        }, indent=2)
-    except Exception as exc:
-        return json.dumps({
-            "success": False,
-            "error": str(exc)
-        }, indent=2)
+    auth_token = token if token else get_auth_token(env)
+    headers = _auth_headers(auth_token)
+    response = _HTTP.get(url, headers=headers, timeout=20)
+    response.raise_for_status()
+    return _json_body(response)
 
 
 @mcp.tool()
@@ -407,11 +473,11 @@ def query_cloudwatch_logs(
         CSV formatted log results
     """
     limit = 10000
-    try:
-        # Lazy import boto3 to avoid requiring it if not used
-        import boto3
-    except ImportError:
-        return "Error: boto3 not installed. Install with: uv add boto3"
+    # Lazy import boto3 to avoid requiring it if not used
+    if _BOTO3 is None:
+        _load_boto3()
+    if _BOTO3 is False:
+        return _BOTO3_ERR
 
     # Validate AWS credentials
     try:
@@ -419,23 +485,19 @@ def query_cloudwatch_logs(
     except ValueError as e:
         return f"Error: {e}"
 
-    # Temporarily set AWS env vars if not already set
-    for key, value in credentials.items():
-        if not os.getenv(key):
-            os.environ[key] = value
+    global _AWS_HYDRATED
+    if not _AWS_HYDRATED:
+        # Set AWS env vars if not already set
+        os.environ.update({k: v for k, v in credentials.items() if k not in os.environ})
 
-    # Unset AWS_PROFILE to avoid conflicts
-    os.environ.pop("AWS_PROFILE", None)
-    os.environ.pop("AWS_DEFAULT_PROFILE", None)
+        # Unset AWS_PROFILE to avoid conflicts
+        os.environ.pop("AWS_PROFILE", None)
+        os.environ.pop("AWS_DEFAULT_PROFILE", None)
+        _AWS_HYDRATED = True
 
     # Determine query string
     if session_id:
-        query = (
-            f"fields @timestamp, record.message | "
-            f"filter @message like /{session_id}/ | "
-            f"sort @timestamp desc | "
-            f"limit {limit}"
-        )
+        query = _session_query(session_id, limit)
     elif not query:
         return "Error: Must provide either query or session_id"
 
@@ -447,23 +509,25 @@ def query_cloudwatch_logs(
 
     # Calculate time range
     if hours:
-        start_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        time_desc = f"{hours} hour{'s' if hours != 1 else ''}"
+        n, unit = hours, "hour"
+        delta = timedelta(hours=hours)
     elif days:
-        start_time = datetime.now(timezone.utc) - timedelta(days=days)
-        time_desc = f"{days} day{'s' if days != 1 else ''}"
+        n, unit = days, "day"
+        delta = timedelta(days=days)
     elif weeks:
-        start_time = datetime.now(timezone.utc) - timedelta(weeks=weeks)
-        time_desc = f"{weeks} week{'s' if weeks != 1 else ''}"
+        n, unit = weeks, "week"
+        delta = timedelta(weeks=weeks)
     else:
-        start_time = datetime.now(timezone.utc) - timedelta(days=1)
-        time_desc = "1 day"
+        n, unit = 1, "day"
+        delta = timedelta(days=1)
 
     end_time = datetime.now(timezone.utc)
+    start_time = end_time - delta
+    time_desc = _fmt_range(n, unit)
 
     # Create CloudWatch Logs client
     try:
-        client = boto3.client('logs')
+        client = _get_logs_client()
     except Exception as e:
         return f"Error creating AWS client: {e}"
 
@@ -480,9 +544,11 @@ def query_cloudwatch_logs(
 
     query_id = response['queryId']
 
-    # Poll for results (max 60 seconds)
-    for _ in range(30):
-        time.sleep(2)
+    # Poll for results with exponential backoff (100ms doubling to 2s, max 60 seconds)
+    delay = 0.1
+    deadline = time.monotonic() + 60
+    while True:
+        time.sleep(delay)
 
         try:
             result = client.get_query_results(queryId=query_id)
@@ -492,30 +558,36 @@ def query_cloudwatch_logs(
         status = result['status']
 
         if status == 'Complete':
-            # Convert results to CSV
+            # Collect non-empty rows and the union of their columns in one pass
+            # Field names repeat in every row, so intern them to share one key object
+            intern = sys.intern
             log_entries = []
+            all_fields = set()
             for result_row in result['results']:
-                entry = {}
-                for field in result_row:
-                    # Skip @ptr field
-                    if field['field'] != '@ptr':
-                        entry[field['field']] = field['value']
+                entry = [
+                    (intern(field['field']), field['value'])
+                    for field in result_row
+                    if field['field'] not in _SKIP_FIELDS
+                ]
                 if entry:
                     log_entries.append(entry)
+                    all_fields.update(name for name, _ in entry)
 
             if not log_entries:
                 return f"Query completed successfully but returned no results.\nQuery: {query}\nTime range: Last {time_desc}"
 
             # Convert to CSV
             output = StringIO()
-            all_fields = set()
-            for entry in log_entries:
-                all_fields.update(entry.keys())
             fields = sorted(all_fields)
+            column = {name: i for i, name in enumerate(fields)}
 
-            writer = csv.DictWriter(output, fieldnames=fields)
-            writer.writeheader()
-            writer.writerows(log_entries)
+            writer = csv.writer(output)
+            writer.writerow(fields)
+            for entry in log_entries:
+                values = [""] * len(fields)
+                for name, value in entry:
+                    values[column[name]] = value
+                writer.writerow(values)
 
             csv_result = output.getvalue()
             return f"Query completed successfully. Found {len(log_entries)} results.\n\n{csv_result}"
@@ -523,7 +595,11 @@ def query_cloudwatch_logs(
         elif status == 'Failed':
             return "Error: Query failed"
 
-    return f"Error: Query timed out. Query ID: {query_id}"
+        # Never sleep past the deadline, however long get_query_results took
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return f"Error: Query timed out. Query ID: {query_id}"
+        delay = min(delay * 2, 2.0, remaining)
 
 
 # This is the main entry point for your server